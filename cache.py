@@ -0,0 +1,409 @@
+"""
+Cache dua tingkat untuk hasil rekomendasi, gambar produk dan katalog.
+
+- Tingkat 1: LRU di dalam proses (objek Python langsung, tanpa serialisasi).
+- Tingkat 2: penyimpanan bersama antar proses/pod. Default SQLite di disk
+  lokal; HTTPBackend untuk server key-value lewat jaringan.
+
+get_or_compute melindungi dari stampede (single-flight): di dalam proses
+hanya satu thread yang menghitung key yang sama, dan antar proses dipakai
+lease di tingkat 2. Semua key diberi versi hash dataset, sehingga katalog
+baru otomatis memakai key baru. SQLite membersihkan entri versi lain saat
+cache dibuat dan entri kedaluwarsa secara berkala saat menulis.
+
+Nilai di tingkat 2 berupa pickle, jadi siapa pun yang bisa menulis ke
+penyimpanan bersama bisa menjalankan kode di setiap replika. Karena itu nilai
+ditandatangani HMAC-SHA256 (terikat ke key-nya) dan ditolak sebelum di-unpickle
+jika tanda tangannya tidak cocok. Backend http wajib memakai secret. SQLite
+tanpa secret hanya dipakai di folder privat milik user ini (default
+~/.cache/wardah, mode 0700); selain itu cache turun ke LRU lokal saja.
+
+Konfigurasi lewat environment:
+    WARDAH_CACHE        sqlite (default) | http | local | off
+    WARDAH_CACHE_PATH   file SQLite
+    WARDAH_CACHE_URL    base URL untuk backend http
+    WARDAH_CACHE_SECRET kunci HMAC, sama di semua pod (wajib untuk http)
+"""
+import hashlib
+import hmac
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import quote
+
+import requests
+
+from catalogue import DATA_DIR, ensure_private_dir
+
+# Naikkan jika format nilai yang disimpan berubah
+KEY_VERSION = 1
+
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+CACHE_BACKEND = os.environ.get("WARDAH_CACHE", "sqlite")
+CACHE_PATH = os.environ.get("WARDAH_CACHE_PATH", os.path.join(DATA_DIR, "cache.sqlite3"))
+CACHE_URL = os.environ.get("WARDAH_CACHE_URL")
+CACHE_SECRET = os.environ.get("WARDAH_CACHE_SECRET")
+
+# Jeda minimal antar pembersihan entri kedaluwarsa di SQLite (detik)
+PURGE_INTERVAL = 10 * 60
+
+
+class LRUCache:
+    """LRU di dalam proses dengan TTL per entri"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(hit, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# ===============================
+# BACKEND TINGKAT 2
+# ===============================
+class SQLiteBackend:
+    """Penyimpanan bersama di disk lokal; aman dipakai banyak proses (WAL)"""
+
+    def __init__(self, path=CACHE_PATH, timeout=5, purge_interval=PURGE_INTERVAL):
+        self.path = path
+        self.timeout = timeout
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None)
+        )
+        conn.commit()
+        # get() hanya menyaring entri kedaluwarsa; hapus sesekali saat menulis
+        if time.monotonic() - self._last_purge > self.purge_interval:
+            self._last_purge = time.monotonic()
+            self.purge_expired()
+
+    def add(self, key, value, ttl=None):
+        """Simpan hanya jika key belum ada (atau sudah kedaluwarsa); True jika berhasil"""
+        now = time.time()
+        conn = self._conn()
+        cursor = conn.execute("""
+            INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE cache.expires_at IS NOT NULL AND cache.expires_at <= ?
+        """, (key, value, now + ttl if ttl else None, now))
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def purge_expired(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def purge_other_versions(self, prefix):
+        """Hapus entri (dan lease) yang key-nya tidak diawali `prefix`"""
+        lease_prefix = f"lease:{prefix}"
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM cache WHERE substr(key, 1, ?) != ? AND substr(key, 1, ?) != ?",
+            (len(prefix), prefix, len(lease_prefix), lease_prefix)
+        )
+        conn.commit()
+
+
+class HTTPBackend:
+    """
+    Server key-value lewat HTTP:
+        GET    /<key>             200 + isi, atau 404
+        PUT    /<key>?ttl=<detik> simpan
+        PUT    + If-None-Match: * 201 jika baru, 412 jika sudah ada
+        DELETE /<key>
+    """
+
+    def __init__(self, base_url=CACHE_URL, timeout=2):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _url(self, key):
+        return f"{self.base_url}/{quote(key, safe='')}"
+
+    def get(self, key):
+        response = self._session().get(self._url(key), timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def set(self, key, value, ttl=None):
+        params = {"ttl": ttl} if ttl else None
+        self._session().put(self._url(key), data=value, params=params,
+                            timeout=self.timeout).raise_for_status()
+
+    def add(self, key, value, ttl=None):
+        params = {"ttl": ttl} if ttl else None
+        response = self._session().put(self._url(key), data=value, params=params,
+                                       headers={"If-None-Match": "*"}, timeout=self.timeout)
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+        return True
+
+    def delete(self, key):
+        self._session().delete(self._url(key), timeout=self.timeout)
+
+
+# ===============================
+# TIERED CACHE
+# ===============================
+class TieredCache:
+    def __init__(self, shared=None, local_maxsize=256, version="", poll_interval=0.05, secret=None):
+        self.local = LRUCache(local_maxsize) if local_maxsize else None
+        self.shared = shared
+        self.secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.secret = self.secret or None
+        self.version = version
+        self.poll_interval = poll_interval
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.local is not None or self.shared is not None
+
+    @property
+    def key_prefix(self):
+        # Mode tanda tangan ikut di key: pembaca tanpa secret tidak pernah
+        # menerima nilai bertanda tangan (dan sebaliknya)
+        mode = "s" if self.secret is not None else "u"
+        return f"v{KEY_VERSION}:{mode}:{self.version}:"
+
+    def make_key(self, key):
+        """Key berversi: namespace terbaca + hash dari seluruh bagian key"""
+        namespace = key[0] if isinstance(key, tuple) else key
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}{namespace}:{digest}"
+
+    def get_or_compute(self, key, compute, ttl=None, dumps=pickle.dumps, loads=pickle.loads,
+                       lease_ttl=60, local=True):
+        """
+        Ambil nilai dari cache atau hitung dengan `compute()`. Panggilan bersamaan
+        untuk key yang sama menunggu satu perhitungan saja. Exception dari
+        `compute` diteruskan ke semua yang menunggu dan tidak disimpan.
+        `local=False` melewati LRU, untuk objek besar yang sudah dipegang
+        pemanggil seumur proses (katalog).
+        """
+        if not self.enabled:
+            return compute()
+
+        full_key = self.make_key(key)
+        local = local and self.local is not None
+        if local:
+            hit, value = self.local.get(full_key)
+            if hit:
+                return value
+
+        with self._lock:
+            future = self._inflight.get(full_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[full_key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._shared_get_or_compute(full_key, compute, ttl, dumps, loads, lease_ttl)
+            if local:
+                self.local.set(full_key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(full_key, None)
+
+    def _shared_get_or_compute(self, full_key, compute, ttl, dumps, loads, lease_ttl):
+        if self.shared is None:
+            return compute()
+
+        hit, value = self._shared_get(full_key, loads)
+        if hit:
+            return value
+
+        # Lease antar proses: yang lain menunggu nilai muncul di tingkat 2
+        lease_key = f"lease:{full_key}"
+        deadline = time.monotonic() + lease_ttl
+        leased = self._call("add", lease_key, uuid.uuid4().bytes, lease_ttl, default=True)
+        while not leased:
+            time.sleep(self.poll_interval)
+            hit, value = self._shared_get(full_key, loads)
+            if hit:
+                return value
+            if time.monotonic() > deadline:
+                break
+            leased = self._call("add", lease_key, uuid.uuid4().bytes, lease_ttl, default=True)
+
+        try:
+            value = compute()
+            self._call("set", full_key, self._sign(full_key, dumps(value)), ttl)
+            return value
+        finally:
+            if leased:
+                self._call("delete", lease_key)
+
+    def _signature(self, full_key, data):
+        return hmac.new(self.secret, full_key.encode("utf-8") + b"\0" + data, hashlib.sha256).digest()
+
+    def _sign(self, full_key, data):
+        if self.secret is None:
+            return data
+        return self._signature(full_key, data) + data
+
+    def _shared_get(self, full_key, loads):
+        """
+        (hit, value) dari tingkat 2. Tanda tangan tidak valid atau isi yang
+        gagal di-`loads` (format lama, data rusak) dianggap miss dan dihapus,
+        sehingga nilainya dihitung ulang.
+        """
+        data = self._call("get", full_key)
+        if data is None:
+            return False, None
+        if self.secret is not None:
+            signature, data = data[:SIGNATURE_SIZE], data[SIGNATURE_SIZE:]
+            if not hmac.compare_digest(signature, self._signature(full_key, data)):
+                print(f"⚠️ Cache: tanda tangan tidak valid untuk {full_key}, diabaikan")
+                return False, None
+        try:
+            return True, loads(data)
+        except Exception as e:
+            print(f"⚠️ Cache: nilai {full_key} tidak bisa dibaca ({e}), dihapus")
+            self._call("delete", full_key)
+            return False, None
+
+    def _call(self, method, *args, default=None):
+        """Error di tingkat 2 tidak boleh menjatuhkan halaman; anggap miss"""
+        try:
+            return getattr(self.shared, method)(*args)
+        except Exception as e:
+            print(f"⚠️ Cache {method} error: {e}")
+            return default
+
+
+def create_cache(backend=CACHE_BACKEND, path=CACHE_PATH, url=CACHE_URL, version="",
+                 local_maxsize=256, secret=CACHE_SECRET):
+    if backend == "off":
+        return TieredCache(local_maxsize=0, version=version)
+    if backend == "local":
+        return TieredCache(local_maxsize=local_maxsize, version=version)
+    if backend == "http":
+        if not url:
+            raise ValueError("WARDAH_CACHE_URL wajib diisi untuk backend http")
+        if not secret:
+            raise ValueError("WARDAH_CACHE_SECRET wajib diisi untuk backend http")
+        return TieredCache(HTTPBackend(url), local_maxsize, version, secret=secret)
+    if backend == "sqlite":
+        if not secret and not _is_private_store(path):
+            print(f"⚠️ Folder cache {os.path.dirname(os.path.abspath(path))} bukan folder privat; "
+                  f"tanpa WARDAH_CACHE_SECRET hanya memakai cache lokal")
+            return TieredCache(local_maxsize=local_maxsize, version=version)
+        cache = TieredCache(SQLiteBackend(path), local_maxsize, version, secret=secret)
+        # Entri dataset/format lama tidak akan dibaca lagi
+        cache._call("purge_other_versions", cache.key_prefix)
+        cache._call("purge_expired")
+        return cache
+    raise ValueError(f"Backend cache tidak dikenal: {backend}")
+
+
+def _is_private_store(path):
+    """File SQLite tanpa tanda tangan hanya aman jika foldernya tidak bisa ditulis user lain"""
+    try:
+        ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    except PermissionError:
+        return False
+    return True
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Cache bersama satu proses, dikonfigurasi dari environment"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            from utils import data_version
+            _default_cache = create_cache(version=data_version())
+        return _default_cache
+
+
+def set_default_cache(cache):
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -0,0 +1,383 @@
+"""
+Representasi katalog produk yang hemat memori.
+
+DataFrame hasil load_and_merge_data menyimpan list Python per baris untuk
+skin_type/category dan beberapa kolom teks panjang di setiap worker.
+CompactCatalogue menyimpan:
+- label sebagai kode integer + offset CSR (satu array numpy per kolom),
+- semua kolom string (name, url, image_url, about, ingredients,
+  combined_text) di satu file blob UTF-8 yang di-memory-map, dialamatkan
+  lewat offset byte. Tidak ada objek Python per baris yang tersisa, dan
+  halaman blob dibagi bersama antar worker lewat page cache.
+
+Kolom yang tidak dipakai lagi setelah vektorisasi (clean_*, name_lower, dst)
+tidak disimpan. load_catalogue membangun katalog di proses terpisah, sehingga
+DataFrame sementara (dan heap yang ditinggalkan parser CSV pandas) tidak
+pernah menetap di worker.
+
+Ukur penghematan RSS (memori privat/anonim) per worker:
+    python catalogue.py --repeat 50
+"""
+import argparse
+import functools
+import gc
+import glob
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+LABEL_COLUMNS = ("skin_type", "category")
+TEXT_COLUMNS = ("name", "url", "image_url", "about", "ingredients", "combined_text")
+
+# Folder per user (bukan /tmp yang bisa ditulis siapa saja): cache dan
+# artefak model di sini berupa pickle
+DATA_DIR = os.environ.get("WARDAH_DATA_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "wardah"
+)
+
+
+def is_private(path):
+    """True jika path milik user ini dan tidak bisa ditulis group/others"""
+    if os.name != "posix":
+        return True
+    st = os.stat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def ensure_private_dir(path):
+    """Buat folder (mode 0700); PermissionError jika folder yang ada bukan privat"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not is_private(path):
+        raise PermissionError(f"Folder {path} harus milik user ini dan tidak bisa ditulis user lain")
+    return path
+
+
+class LabelIndex:
+    """Label multi-nilai per baris dalam format CSR (vocab, codes, offsets)"""
+
+    def __init__(self, vocab, codes, offsets):
+        self.vocab = vocab
+        self.codes = codes
+        self.offsets = offsets
+        self._lookup = {label: code for code, label in enumerate(vocab)}
+
+    @classmethod
+    def from_lists(cls, rows):
+        vocab = sorted({label for row in rows for label in row})
+        lookup = {label: code for code, label in enumerate(vocab)}
+        codes = np.fromiter(
+            (lookup[label] for row in rows for label in row),
+            dtype=np.int32
+        )
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(row) for row in rows])
+        return cls(vocab, codes, offsets)
+
+    def row(self, i):
+        return [self.vocab[c] for c in self.codes[self.offsets[i]:self.offsets[i + 1]]]
+
+    def has_any(self, labels):
+        """Mask boolean baris yang memiliki minimal satu label dari `labels`"""
+        selected = [self._lookup[label] for label in labels if label in self._lookup]
+        hit = np.isin(self.codes, selected)
+        hits_before = np.concatenate(([0], np.cumsum(hit)))
+        return hits_before[self.offsets[1:]] > hits_before[self.offsets[:-1]]
+
+    def counts(self):
+        """Jumlah produk per label"""
+        counts = np.bincount(self.codes, minlength=len(self.vocab))
+        return dict(zip(self.vocab, counts.tolist()))
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.offsets.nbytes
+
+
+# Katalog yang masih hidup di proses ini; blob miliknya tidak boleh dihapus
+_live_catalogues = weakref.WeakSet()
+
+
+class CompactCatalogue:
+    def __init__(self, labels, blob_path, text_offsets):
+        self.labels = labels
+        self.blob_path = blob_path
+        self.text_offsets = text_offsets
+        self._blob = _open_blob(blob_path)
+        _live_catalogues.add(self)
+
+    @classmethod
+    def from_frame(cls, df, data_dir=DATA_DIR):
+        """Bangun katalog dari DataFrame hasil load_and_merge_data"""
+        labels = {col: LabelIndex.from_lists(list(df[col])) for col in LABEL_COLUMNS}
+
+        # Semua kolom string disambung jadi satu blob UTF-8, ditulis langsung ke file
+        os.makedirs(data_dir, exist_ok=True)
+        digest = hashlib.sha1()
+        text_offsets = {}
+
+        def write(f):
+            position = 0
+            for col in TEXT_COLUMNS:
+                offsets = np.empty(len(df) + 1, dtype=np.int64)
+                offsets[0] = position
+                values = df[col] if col in df else [None] * len(df)
+                for i, value in enumerate(values):
+                    encoded = ("" if pd.isna(value) else str(value)).encode("utf-8")
+                    f.write(encoded)
+                    digest.update(encoded)
+                    position += len(encoded)
+                    offsets[i + 1] = position
+                text_offsets[col] = offsets
+
+        tmp_path = _write_temp(data_dir, write)
+        # Nama file berdasarkan hash isi, agar worker lain bisa berbagi page cache
+        blob_path = os.path.join(data_dir, f"catalogue-{digest.hexdigest()}.bin")
+        os.replace(tmp_path, blob_path)
+        catalogue = cls(labels, blob_path, text_offsets)
+        _remove_stale_blobs(data_dir)
+        return catalogue
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_blob"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._blob = _open_blob(self.blob_path)
+        _live_catalogues.add(self)
+
+    def dumps(self):
+        """Bentuk portabel termasuk isi blob, untuk cache bersama antar pod"""
+        with open(self.blob_path, "rb") as f:
+            return pickle.dumps((self.__getstate__(), f.read()), protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, data, data_dir=DATA_DIR):
+        state, blob = pickle.loads(data)
+        # Nama blob berbasis hash isi, jadi aman dipakai ulang jika sudah ada
+        state["blob_path"] = os.path.join(data_dir, os.path.basename(state["blob_path"]))
+        published = not os.path.exists(state["blob_path"])
+        if published:
+            os.makedirs(data_dir, exist_ok=True)
+            os.replace(_write_temp(data_dir, lambda f: f.write(blob)), state["blob_path"])
+        catalogue = cls.__new__(cls)
+        catalogue.__setstate__(state)
+        if published:
+            _remove_stale_blobs(data_dir)
+        return catalogue
+
+    def __len__(self):
+        return len(self.text_offsets["name"]) - 1
+
+    def text(self, column, i):
+        offsets = self.text_offsets[column]
+        return self._blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def texts(self, column):
+        """Iterator teks satu kolom, dibaca langsung dari blob"""
+        return (self.text(column, i) for i in range(len(self)))
+
+    def row(self, i):
+        """Satu produk dalam bentuk dict, sesuai kebutuhan kartu produk di streamlit.py"""
+        return {
+            "name": self.text("name", i),
+            "url": self.text("url", i),
+            "image_url": self.text("image_url", i) or None,
+            "category": self.labels["category"].row(i),
+            "skin_type": self.labels["skin_type"].row(i),
+            "about": self.text("about", i),
+            "ingredients": self.text("ingredients", i),
+        }
+
+    def frame(self, indices):
+        """DataFrame kecil berisi baris terpilih (index = posisi di katalog)"""
+        indices = list(indices)
+        return pd.DataFrame([self.row(i) for i in indices], index=indices)
+
+    def options(self, column):
+        """Daftar label unik (terurut) untuk pilihan di sidebar"""
+        return list(self.labels[column].vocab)
+
+    def has_any(self, column, labels):
+        return self.labels[column].has_any(labels)
+
+    def counts(self, column):
+        return self.labels[column].counts()
+
+    @property
+    def nbytes(self):
+        """Memori array resident (tanpa blob yang di-memory-map)"""
+        label_bytes = sum(index.nbytes for index in self.labels.values())
+        offset_bytes = sum(o.nbytes for o in self.text_offsets.values())
+        return label_bytes + offset_bytes
+
+
+def _open_blob(path):
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_temp(data_dir, write):
+    """Tulis lewat `write(f)` ke file sementara; file dihapus jika penulisan gagal"""
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _remove_stale_blobs(data_dir):
+    """
+    Hapus blob versi dataset lama yang tidak dipakai katalog hidup di proses
+    ini. Worker lain yang masih me-map blob lama tetap aman di POSIX; di
+    Windows file yang sedang dipakai gagal dihapus dan dilewati.
+    """
+    in_use = {os.path.abspath(c.blob_path) for c in list(_live_catalogues)}
+    for path in glob.glob(os.path.join(data_dir, "catalogue-*.bin")):
+        if os.path.abspath(path) in in_use:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _build_catalogue(load, data_dir):
+    return CompactCatalogue.from_frame(load(), data_dir)
+
+
+# Bukan multiprocessing: proses spawn mengimpor ulang __main__ dengan folder app
+# di sys.path, sehingga streamlit.py di repo ini menutupi paket streamlit.
+_BUILD_SCRIPT = """
+import pickle, sys
+from catalogue import _build_catalogue
+load, data_dir = pickle.load(sys.stdin.buffer)
+out, sys.stdout = sys.stdout, sys.stderr
+pickle.dump(_build_catalogue(load, data_dir), out.buffer)
+"""
+
+
+def load_catalogue(load=None, data_dir=DATA_DIR):
+    """Muat dataset dan bangun CompactCatalogue di proses terpisah"""
+    if load is None:
+        from utils import load_and_merge_data
+        load = load_and_merge_data
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [here, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-c", _BUILD_SCRIPT],
+        input=pickle.dumps((load, data_dir)),
+        stdout=subprocess.PIPE,
+        env=env,
+        check=True
+    )
+    return pickle.loads(result.stdout)
+
+
+# ===============================
+# PENGUKURAN RSS
+# ===============================
+def _rss_bytes():
+    """RSS anonim (heap privat proses); halaman file mmap tidak dihitung"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _release_free_memory():
+    """Kembalikan heap yang sudah bebas ke OS agar RSS mencerminkan data yang hidup"""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _load_repeated(repeat):
+    """Muat katalog yang diulang N kali (setiap baris objek tersendiri, seperti CSV besar)"""
+    import contextlib
+    import io
+    import shutil
+    from utils import load_and_merge_data
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(here, "wardah_skincare_clean.csv"), encoding="utf-8-sig") as f:
+            header, *rows = f.read().splitlines(keepends=True)
+        with open(os.path.join(tmp_dir, "wardah_skincare_clean.csv"), "w", encoding="utf-8") as f:
+            f.write(header)
+            f.writelines(rows * repeat)
+        shutil.copy(os.path.join(here, "wardah_product_images.csv"), tmp_dir)
+
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return load_and_merge_data()
+        finally:
+            os.chdir(cwd)
+
+
+def _measure_worker(mode, repeat):
+    import utils  # noqa: F401 - import dependensi sebelum baseline
+
+    _release_free_memory()
+    baseline = _rss_bytes()
+    if mode == "compact":
+        # Rujuk lewat nama modul: saat dijalankan sebagai skrip, modul ini adalah __main__
+        from catalogue import _load_repeated as load_repeated
+        data = load_catalogue(functools.partial(load_repeated, repeat))
+    else:
+        data = _load_repeated(repeat)
+    _release_free_memory()
+    rss = _rss_bytes() - baseline
+    del data
+    return rss
+
+
+def measure_rss(repeat=1):
+    """RSS tambahan per worker untuk DataFrame vs CompactCatalogue (proses terpisah)"""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in ("dataframe", "compact"):
+        # Proses baru per mode agar heap keduanya tidak saling memengaruhi
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            results[mode] = pool.submit(_measure_worker, mode, repeat).result()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ukur RSS katalog per worker")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="gandakan katalog N kali untuk mensimulasikan katalog besar")
+    args = parser.parse_args()
+
+    results = measure_rss(args.repeat)
+    df_rss, compact_rss = results["dataframe"], results["compact"]
+    print(f"📦 Katalog x{args.repeat}")
+    print(f"- DataFrame        : {df_rss / 1024:,.0f} KiB")
+    print(f"- CompactCatalogue : {compact_rss / 1024:,.0f} KiB")
+    if df_rss > 0:
+        print(f"- Penghematan      : {(1 - compact_rss / df_rss) * 100:.1f}%")
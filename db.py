@@ -1,6 +1,5 @@
 import tempfile
 import mysql.connector
-import streamlit as st
 
 
 class DatabaseConnection:
@@ -9,6 +8,9 @@ class DatabaseConnection:
 
     def connect(self):
         """Membuat koneksi ke database MySQL (Aiven)"""
+        # Import di sini agar modul ini bisa dipakai tanpa runtime Streamlit
+        import streamlit as st
+
         try:
             self.connection = mysql.connector.connect(
                 host=st.secrets["mysql"]["host"],
@@ -73,3 +75,51 @@ class DatabaseConnection:
             return False
 
 
+# ===============================
+# SAVE RECOMMENDATION (HALAMAN UTAMA)
+# ===============================
+def save_recommendation(connect, user_name, user_age, gender, skin_types, categories,
+                        recommendations, max_recommendations=3):
+    """
+    Simpan user history dan rekomendasi teratas dalam satu koneksi.
+    `connect` adalah fungsi yang mengembalikan koneksi MySQL (atau None).
+    Error dari database diteruskan ke pemanggil.
+    """
+    conn = connect()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+
+        # 1. Simpan user history
+        skin_types_str = ",".join(skin_types) if skin_types else ""
+        categories_str = ",".join(categories) if categories else ""
+
+        cursor.execute("""
+        INSERT INTO user_history 
+        (username, age, gender, skin_type, category) 
+        VALUES (%s, %s, %s, %s, %s)
+        """, (user_name, user_age, gender, skin_types_str, categories_str))
+
+        user_id = cursor.lastrowid
+
+        # 2. Simpan rekomendasi produk
+        for i in range(min(max_recommendations, len(recommendations))):
+            product = recommendations.iloc[i]
+            cursor.execute("""
+            INSERT INTO item_recommend 
+            (user_id, product_name, rank_position, product_urls) 
+            VALUES (%s, %s, %s, %s)
+            """, (
+                user_id,
+                product['name'],
+                i + 1,
+                product.get('url')
+            ))
+        conn.commit()
+        cursor.close()
+
+        return user_id
+    finally:
+        conn.close()
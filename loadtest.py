@@ -0,0 +1,485 @@
+"""
+Load test untuk sistem rekomendasi Wardah.
+
+Mensimulasikan beberapa sesi Streamlit yang berjalan bersamaan dalam satu
+proses (Streamlit menjalankan setiap sesi di thread tersendiri). Setiap sesi
+menjalankan alur yang sama dengan tombol "Cari Rekomendasi" di streamlit.py:
+SkincareRecommender.recommend -> save_recommendation -> get_product_image
+untuk setiap produk. Database diganti MySQL palsu di dalam proses dan gambar
+dilayani server HTTP lokal dengan latensi buatan.
+
+Cache (utils.get_product_image dan recommend) memakai SQLite sementara secara
+default; --cache http menjalankan server key-value lokal sebagai pengganti
+backend jaringan, --cache off mengukur jalur tanpa cache.
+
+Contoh:
+    python loadtest.py --sessions 16 --duration 30 --image-latency 0.1
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from cache import create_cache, set_default_cache
+from catalogue import load_catalogue
+from db import save_recommendation
+from recommender import SkincareRecommender
+from utils import data_version, get_product_image
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(REPO_DIR, "assets")
+
+# Nilai default sidebar di streamlit.py
+DEFAULT_SKIN_TYPE = "all skin types"
+DEFAULT_CATEGORY = "serum"
+DEFAULT_TOP_N = 6
+TOP_N_RANGE = (3, 12)
+
+# Jeda minimal setelah request gagal, agar backend yang error tidak membuat
+# sesi berputar tanpa henti (mengacaukan throughput dan sampel stack)
+ERROR_BACKOFF = 0.05
+
+# Melindungi results["errors"] saat hitungan error per sesi digabung
+RESULTS_LOCK = threading.Lock()
+
+
+# ===============================
+# FAKE MYSQL
+# ===============================
+class FakeMySQL:
+    """
+    Pengganti server MySQL di dalam proses.
+    Jumlah koneksi dibatasi seperti max_connections, dan commit diserialkan
+    seperti flush redo log pada satu server.
+    """
+
+    def __init__(self, connect_latency=0.02, query_latency=0.005,
+                 commit_latency=0.005, max_connections=10):
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self.commit_latency = commit_latency
+        self._connections = threading.BoundedSemaphore(max_connections)
+        self._commit_lock = threading.Lock()
+        self._tables_lock = threading.Lock()
+        self.tables = defaultdict(list)
+
+    def connect(self):
+        self._connections.acquire()
+        time.sleep(self.connect_latency)
+        return _FakeConnection(self)
+
+    def _insert(self, query, params):
+        match = re.search(r"INSERT\s+INTO\s+(\w+)", query, re.IGNORECASE)
+        table = match.group(1) if match else "unknown"
+        with self._tables_lock:
+            rows = self.tables[table]
+            rows.append(params)
+            return len(rows)
+
+
+class _FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.open = True
+
+    def is_connected(self):
+        return self.open
+
+    def cursor(self):
+        return _FakeCursor(self.server)
+
+    def commit(self):
+        with self.server._commit_lock:
+            time.sleep(self.server.commit_latency)
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self.server._connections.release()
+
+
+class _FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        time.sleep(self.server.query_latency)
+        self.lastrowid = self.server._insert(query, params)
+
+    def close(self):
+        pass
+
+
+# ===============================
+# IMAGE SERVER LOKAL
+# ===============================
+class ImageServer:
+    """Server HTTP lokal yang melayani gambar dari folder assets dengan latensi buatan"""
+
+    def __init__(self, latency=0.05, jitter=0.02, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.images = []
+        for file_name in sorted(os.listdir(ASSETS_DIR)):
+            with open(os.path.join(ASSETS_DIR, file_name), "rb") as f:
+                self.images.append(f.read())
+
+        server = self
+        rng = random.Random(seed)
+        rng_lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with rng_lock:
+                    extra = rng.expovariate(1 / server.jitter) if server.jitter > 0 else 0
+                time.sleep(server.latency + extra)
+                body = server.images[hash(self.path) % len(server.images)]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url_for(self, image_url):
+        """Arahkan URL gambar asli ke server lokal"""
+        if pd.isna(image_url) or not str(image_url).strip():
+            return None
+        return f"{self.base_url}/{quote(str(image_url).rstrip('/').split('/')[-1])}"
+
+
+# ===============================
+# KEY-VALUE SERVER LOKAL
+# ===============================
+class KVServer:
+    """Pengganti backend cache jaringan, mengikuti protokol cache.HTTPBackend"""
+
+    def __init__(self):
+        store = {}
+        lock = threading.Lock()
+
+        def live(key):
+            entry = store.get(key)
+            if entry and (entry[1] is None or entry[1] > time.time()):
+                return entry
+            return None
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with lock:
+                    entry = live(urlsplit(self.path).path)
+                if entry is None:
+                    self._reply(404)
+                else:
+                    self._reply(200, entry[0])
+
+            def do_PUT(self):
+                url = urlsplit(self.path)
+                ttl = parse_qs(url.query).get("ttl")
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                expires_at = time.time() + float(ttl[0]) if ttl else None
+                with lock:
+                    if self.headers.get("If-None-Match") == "*" and live(url.path):
+                        self._reply(412)
+                        return
+                    store[url.path] = (body, expires_at)
+                self._reply(201)
+
+            def do_DELETE(self):
+                with lock:
+                    store.pop(urlsplit(self.path).path, None)
+                self._reply(204)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ===============================
+# WORKLOAD
+# ===============================
+class Workload:
+    """
+    Distribusi input sidebar. Sebagian besar user memakai nilai default,
+    sisanya memilih 1-2 opsi dengan peluang sebanding frekuensi di katalog.
+    """
+
+    def __init__(self, catalogue, default_ratio=0.4):
+        self.default_ratio = default_ratio
+        skin_counts = catalogue.counts("skin_type")
+        category_counts = catalogue.counts("category")
+        self.skin_types = sorted(skin_counts)
+        self.skin_weights = [skin_counts[s] for s in self.skin_types]
+        self.categories = sorted(category_counts)
+        self.category_weights = [category_counts[c] for c in self.categories]
+
+    def _pick(self, rng, options, weights, default):
+        if default in options and rng.random() < self.default_ratio:
+            return [default]
+        k = 1 if rng.random() < 0.7 else 2
+        return sorted(set(rng.choices(options, weights=weights, k=k)))
+
+    def sample(self, rng):
+        skin_types = self._pick(rng, self.skin_types, self.skin_weights, DEFAULT_SKIN_TYPE)
+        categories = self._pick(rng, self.categories, self.category_weights, DEFAULT_CATEGORY)
+        if rng.random() < 0.5:
+            top_n = DEFAULT_TOP_N
+        else:
+            top_n = rng.randint(*TOP_N_RANGE)
+        return skin_types, categories, top_n
+
+
+# ===============================
+# STACK SAMPLER
+# ===============================
+class StackSampler(threading.Thread):
+    """
+    Mengambil sampel stack thread sesi secara berkala untuk melihat di mana
+    thread menghabiskan waktu (menunggu lock, socket, atau CPU).
+    """
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.thread_ids = set()
+        self.samples = Counter()
+        self.total = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    @staticmethod
+    def _site(frame):
+        innermost = frame
+        caller = None
+        while frame is not None:
+            if frame.f_code.co_filename.startswith(REPO_DIR):
+                caller = frame
+                break
+            frame = frame.f_back
+
+        def describe(f):
+            return f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)}:{f.f_lineno})"
+
+        site = describe(innermost)
+        if caller is not None and caller is not innermost:
+            site += f" <- {describe(caller)}"
+        return site
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[self._site(frame)] += 1
+                    self.total += 1
+
+
+# ===============================
+# SESI
+# ===============================
+def run_session(session_id, args, recommender, workload, fake_db, image_server,
+                deadline, results, sampler):
+    sampler.thread_ids.add(threading.get_ident())
+    rng = random.Random(args.seed + session_id)
+    errors = Counter()
+
+    while time.perf_counter() < deadline:
+        skin_types, categories, top_n = workload.sample(rng)
+        try:
+            t0 = time.perf_counter()
+            recs = recommender.recommend(skin_types, categories, top_n)
+            t1 = time.perf_counter()
+
+            if not recs.empty:
+                save_recommendation(
+                    fake_db.connect,
+                    f"loadtest-{session_id}", 25, "Perempuan",
+                    skin_types, categories,
+                    recs
+                )
+            t2 = time.perf_counter()
+
+            for _, product in recs.iterrows():
+                image_url = image_server.url_for(product.get("image_url"))
+                if image_url:
+                    get_product_image(image_url, product["name"])
+            t3 = time.perf_counter()
+        except Exception as e:
+            errors[type(e).__name__] += 1
+            failed = True
+        else:
+            results["recommend"].append(t1 - t0)
+            results["save"].append(t2 - t1)
+            results["images"].append(t3 - t2)
+            results["total"].append(t3 - t0)
+            failed = False
+
+        think = rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0
+        if failed:
+            think = max(think, ERROR_BACKOFF)
+        if think:
+            time.sleep(think)
+
+    sampler.thread_ids.discard(threading.get_ident())
+    with RESULTS_LOCK:
+        results["errors"].update(errors)
+
+
+def print_report(args, results, elapsed, fake_db, sampler):
+    requests_done = len(results["total"])
+    print("\n📊 Hasil load test")
+    print(f"- Sesi bersamaan : {args.sessions}")
+    print(f"- Cache          : {args.cache}")
+    print(f"- Durasi         : {elapsed:.1f} s")
+    print(f"- Request selesai: {requests_done}")
+    print(f"- Throughput     : {requests_done / elapsed:.2f} req/s")
+    if results["errors"]:
+        print(f"- Error          : {dict(results['errors'])}")
+    print(f"- Baris DB       : { {t: len(rows) for t, rows in fake_db.tables.items()} }")
+
+    print(f"\n⏱️ Latensi (ms)   {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for stage in ("recommend", "save", "images", "total"):
+        values = np.array(results[stage]) * 1000
+        if len(values) == 0:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"- {stage:<14} {p50:9.1f} {p95:9.1f} {p99:9.1f} {values.max():9.1f}")
+
+    if sampler.total:
+        print(f"\n🧵 Posisi thread sesi ({sampler.total} sampel)")
+        for site, count in sampler.samples.most_common(args.top_sites):
+            print(f"  {count / sampler.total * 100:5.1f}%  {site}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test sesi Streamlit Wardah")
+    parser.add_argument("--sessions", type=int, default=8, help="jumlah sesi bersamaan")
+    parser.add_argument("--duration", type=float, default=20, help="durasi (detik)")
+    parser.add_argument("--think-time", type=float, default=0,
+                        help="rata-rata jeda antar pencarian per sesi (detik)")
+    parser.add_argument("--db-connect-latency", type=float, default=0.02)
+    parser.add_argument("--db-query-latency", type=float, default=0.005)
+    parser.add_argument("--db-commit-latency", type=float, default=0.005)
+    parser.add_argument("--db-max-connections", type=int, default=10)
+    parser.add_argument("--image-latency", type=float, default=0.05)
+    parser.add_argument("--image-jitter", type=float, default=0.02)
+    parser.add_argument("--cache", choices=["sqlite", "http", "local", "off"], default="sqlite",
+                        help="backend cache yang dipakai selama tes")
+    parser.add_argument("--sample-interval", type=float, default=0.005,
+                        help="interval sampling stack (detik)")
+    parser.add_argument("--top-sites", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="wardah-loadtest-") as cache_dir:
+        run(args, cache_dir)
+
+
+def run(args, cache_dir):
+    kv_server = None
+    if args.cache == "http":
+        kv_server = KVServer().start()
+    cache = create_cache(
+        args.cache,
+        path=os.path.join(cache_dir, "cache.sqlite3"),
+        url=kv_server.base_url if kv_server else None,
+        version=data_version(),
+        secret=os.urandom(32)
+    )
+    set_default_cache(cache)
+
+    catalogue = load_catalogue()
+    recommender = SkincareRecommender(catalogue, cache=cache)
+    workload = Workload(catalogue)
+    fake_db = FakeMySQL(
+        connect_latency=args.db_connect_latency,
+        query_latency=args.db_query_latency,
+        commit_latency=args.db_commit_latency,
+        max_connections=args.db_max_connections
+    )
+    image_server = ImageServer(args.image_latency, args.image_jitter, args.seed).start()
+    sampler = StackSampler(args.sample_interval)
+
+    results = defaultdict(list)
+    results["errors"] = Counter()
+
+    print(f"\n🚀 Menjalankan {args.sessions} sesi selama {args.duration} s...")
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(i, args, recommender, workload, fake_db, image_server,
+                  deadline, results, sampler),
+            name=f"session-{i}"
+        )
+        for i in range(args.sessions)
+    ]
+    sampler.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    image_server.stop()
+    if kv_server:
+        kv_server.stop()
+
+    print_report(args, results, elapsed, fake_db, sampler)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+Pipeline build model TF-IDF + cosine similarity.
+
+Jalur serial memakai TfidfVectorizer + cosine_similarity seperti sebelumnya.
+Jalur paralel memecah combined_text menjadi chunk yang ditokenisasi di process
+pool, menggabungkan vocabulary per chunk sesuai urutan kemunculan pertama
+(sama seperti CountVectorizer), lalu menghitung matriks similarity per blok
+baris di beberapa core. Hasilnya identik bit-per-bit dengan jalur serial.
+
+_sort_features, _limit_features dan _fit_tfidf menyalin langkah internal
+CountVectorizer/TfidfVectorizer scikit-learn 1.8.0 (versi di requirements.txt;
+juga cocok dengan 1.9.1). Karena bisa bergeser saat sklearn di-upgrade, setiap
+build paralel lebih dulu membandingkan kedua jalur pada sampel korpus
+(check_parity) dan kembali ke jalur serial jika hasilnya berbeda.
+
+Jalankan offline sebelum deploy:
+    python model_builder.py --workers 8
+atau dari aplikasi lewat BackgroundBuild.
+"""
+import argparse
+import hashlib
+import math
+import multiprocessing
+import os
+import pickle
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from numbers import Integral
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from catalogue import DATA_DIR, ensure_private_dir, is_private
+
+VECTORIZER_PARAMS = {
+    "max_features": 5000,
+    "ngram_range": (1, 2),
+}
+
+MODEL_PATH = os.environ.get("WARDAH_MODEL_PATH", os.path.join(DATA_DIR, "model.pkl"))
+
+# Batas memori satu blok similarity (float64) per worker
+BLOCK_BYTES = 64 * 1024 * 1024
+
+# Di bawah ini build serial lebih cepat: setiap worker spawn mengimpor ulang
+# sklearn (beberapa detik) sebelum mulai bekerja
+PARALLEL_MIN_DOCS = 5000
+
+# Ukuran sampel check_parity; cukup besar agar batas max_features ikut teruji
+PARITY_SAMPLE_DOCS = 200
+PARITY_CHUNK_DOCS = 50
+
+PROGRESS_FORMAT = "⏳ {stage}: {done}/{total}"
+PROGRESS_PATTERN = re.compile(r"^⏳ (\w+): (\d+)/(\d+)$")
+
+
+class ModelArtifact:
+    """Hasil build: vocabulary, idf, matriks TF-IDF dan similarity antar produk"""
+
+    def __init__(self, feature_names, idf, tfidf_matrix, cosine_sim, corpus_hash):
+        self.feature_names = feature_names
+        self.idf = idf
+        self.tfidf_matrix = tfidf_matrix
+        self.cosine_sim = cosine_sim
+        self.corpus_hash = corpus_hash
+
+
+def corpus_digest(texts):
+    """Hash isi korpus, untuk memastikan artefak cocok dengan katalog"""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def print_progress(stage, done, total):
+    print(PROGRESS_FORMAT.format(stage=stage, done=done, total=total), flush=True)
+
+
+def plan_workers(n_docs, workers=None, chunk_docs=None, min_docs=PARALLEL_MIN_DOCS):
+    """Jumlah worker yang layak: 1 (serial) untuk korpus kecil, maksimal satu per chunk"""
+    workers = workers or os.cpu_count() or 1
+    if n_docs < min_docs:
+        return 1
+    if chunk_docs:
+        workers = min(workers, math.ceil(n_docs / chunk_docs))
+    return max(1, workers)
+
+
+# ===============================
+# JALUR SERIAL
+# ===============================
+def build_serial(texts, progress=None):
+    texts = list(texts)
+    tfidf = TfidfVectorizer(**VECTORIZER_PARAMS)
+    tfidf_matrix = tfidf.fit_transform(texts)
+    if progress:
+        progress("tfidf", 1, 1)
+    cosine_sim = cosine_similarity(tfidf_matrix)
+    if progress:
+        progress("similarity", 1, 1)
+    return ModelArtifact(
+        feature_names=tfidf.get_feature_names_out(),
+        idf=tfidf.idf_,
+        tfidf_matrix=tfidf_matrix,
+        cosine_sim=cosine_sim,
+        corpus_hash=corpus_digest(texts)
+    )
+
+
+# ===============================
+# JALUR PARALEL
+# ===============================
+def _count_chunk(texts):
+    """Tokenisasi satu chunk: vocabulary lokal (urutan kemunculan) + hitungan per dokumen"""
+    analyze = TfidfVectorizer(**VECTORIZER_PARAMS).build_analyzer()
+    vocabulary = {}
+    indices = []
+    values = []
+    indptr = [0]
+    for doc in texts:
+        feature_counter = {}
+        for feature in analyze(doc):
+            feature_idx = vocabulary.setdefault(feature, len(vocabulary))
+            feature_counter[feature_idx] = feature_counter.get(feature_idx, 0) + 1
+        indices.extend(feature_counter.keys())
+        values.extend(feature_counter.values())
+        indptr.append(len(indices))
+    return (
+        list(vocabulary),
+        np.asarray(indices, dtype=np.int64),
+        np.asarray(values, dtype=np.intc),
+        np.asarray(indptr, dtype=np.int64)
+    )
+
+
+def _merge_counts(chunks):
+    """
+    Gabungkan hasil per chunk menjadi satu matriks hitungan. Vocabulary global
+    diberi id sesuai urutan chunk, sehingga sama dengan CountVectorizer serial.
+    """
+    vocabulary = {}
+    all_indices, all_values, all_indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    offset = 0
+    for terms, indices, values, indptr in chunks:
+        global_ids = np.fromiter(
+            (vocabulary.setdefault(term, len(vocabulary)) for term in terms),
+            dtype=np.int64, count=len(terms)
+        )
+        all_indices.append(global_ids[indices])
+        all_values.append(values)
+        all_indptr.append(indptr[1:] + offset)
+        offset += indptr[-1]
+
+    indices_dtype = np.int64 if offset > np.iinfo(np.int32).max else np.int32
+    X = sp.csr_matrix(
+        (
+            np.concatenate(all_values),
+            np.concatenate(all_indices).astype(indices_dtype),
+            np.concatenate(all_indptr).astype(indices_dtype)
+        ),
+        shape=(sum(len(c[3]) - 1 for c in chunks), len(vocabulary)),
+        dtype=np.float64
+    )
+    X.sort_indices()
+    return vocabulary, X
+
+
+def _sort_features(X, vocabulary):
+    sorted_features = sorted(vocabulary.items())
+    map_index = np.empty(len(sorted_features), dtype=X.indices.dtype)
+    for new_val, (term, old_val) in enumerate(sorted_features):
+        vocabulary[term] = new_val
+        map_index[old_val] = new_val
+    X.indices = map_index.take(X.indices, mode="clip")
+    return X
+
+
+def _limit_features(X, vocabulary, high, low, limit):
+    dfs = np.bincount(X.indices, minlength=X.shape[1])
+    mask = np.ones(len(dfs), dtype=bool)
+    mask &= dfs <= high
+    mask &= dfs >= low
+    if limit is not None and mask.sum() > limit:
+        tfs = np.asarray(X.sum(axis=0)).ravel()
+        mask_inds = (-tfs[mask]).argsort()[:limit]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+
+    new_indices = np.cumsum(mask) - 1
+    for term, old_index in list(vocabulary.items()):
+        if mask[old_index]:
+            vocabulary[term] = new_indices[old_index]
+        else:
+            del vocabulary[term]
+    return X[:, np.where(mask)[0]]
+
+
+def _fit_tfidf(chunks):
+    """Langkah setelah tokenisasi, mengikuti TfidfVectorizer.fit_transform"""
+    defaults = TfidfVectorizer(**VECTORIZER_PARAMS)
+    vocabulary, X = _merge_counts(chunks)
+
+    n_doc = X.shape[0]
+    max_df, min_df = defaults.max_df, defaults.min_df
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * n_doc
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * n_doc
+    if defaults.max_features is not None:
+        X = _sort_features(X, vocabulary)
+    X = _limit_features(X, vocabulary, max_doc_count, min_doc_count, defaults.max_features)
+    if defaults.max_features is None:
+        X = _sort_features(X, vocabulary)
+
+    transformer = TfidfTransformer(
+        norm=defaults.norm,
+        use_idf=defaults.use_idf,
+        smooth_idf=defaults.smooth_idf,
+        sublinear_tf=defaults.sublinear_tf
+    )
+    transformer.fit(X)
+    feature_names = np.asarray(
+        [term for term, _ in sorted(vocabulary.items(), key=lambda item: item[1])],
+        dtype=object
+    )
+    return feature_names, transformer.idf_, transformer.transform(X, copy=False)
+
+
+# Matriks yang sudah dimuat worker, per path file .npz
+_block_state = {}
+
+
+def _similarity_block(matrix_dir, start, end):
+    if _block_state.get("dir") != matrix_dir:
+        _block_state["dir"] = matrix_dir
+        _block_state["X"] = sp.load_npz(os.path.join(matrix_dir, "X.npz"))
+        _block_state["XT"] = sp.load_npz(os.path.join(matrix_dir, "XT.npz"))
+    return start, (_block_state["X"][start:end] @ _block_state["XT"]).toarray()
+
+
+def _cosine_similarity_blocked(tfidf_matrix, pool, workers, block_rows, out, progress):
+    """cosine_similarity per blok baris; paling banyak 2 blok per worker sedang diproses"""
+    X_normalized = normalize(tfidf_matrix, copy=True)
+    n = X_normalized.shape[0]
+    blocks = [(start, min(start + block_rows, n)) for start in range(0, n, block_rows)]
+
+    # Worker membaca matriks dari file sekali saja, bukan dikirim per blok
+    with tempfile.TemporaryDirectory() as matrix_dir:
+        sp.save_npz(os.path.join(matrix_dir, "X.npz"), X_normalized, compressed=False)
+        sp.save_npz(os.path.join(matrix_dir, "XT.npz"), X_normalized.T.tocsr(), compressed=False)
+
+        pending = set()
+        done = 0
+        for start, end in blocks:
+            pending.add(pool.submit(_similarity_block, matrix_dir, start, end))
+            if len(pending) >= 2 * workers:
+                done += _drain(pending, out)
+                progress("similarity", done, len(blocks))
+        while pending:
+            done += _drain(pending, out)
+            progress("similarity", done, len(blocks))
+    return out
+
+
+def _drain(pending, out):
+    """Tunggu minimal satu blok selesai dan salin ke matriks hasil"""
+    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in finished:
+        pending.discard(future)
+        start, block = future.result()
+        out[start:start + len(block)] = block
+    return len(finished)
+
+
+def same_model(a, b):
+    """True jika dua artefak identik bit-per-bit"""
+    return (
+        np.array_equal(a.feature_names, b.feature_names)
+        and np.array_equal(a.idf, b.idf)
+        and a.tfidf_matrix.shape == b.tfidf_matrix.shape
+        and (a.tfidf_matrix != b.tfidf_matrix).nnz == 0
+        and np.array_equal(a.cosine_sim, b.cosine_sim)
+    )
+
+
+def check_parity(texts, chunk_docs=PARITY_CHUNK_DOCS):
+    """
+    Jalankan langkah jalur paralel di proses ini (beberapa chunk, dua blok
+    similarity) dan bandingkan dengan build_serial pada korpus yang sama.
+    """
+    texts = list(texts)
+    chunks = [_count_chunk(texts[i:i + chunk_docs]) for i in range(0, len(texts), chunk_docs)]
+    feature_names, idf, tfidf_matrix = _fit_tfidf(chunks)
+    X = normalize(tfidf_matrix, copy=True)
+    XT = X.T.tocsr()
+    half = max(1, len(texts) // 2)
+    cosine_sim = np.vstack([(X[:half] @ XT).toarray(), (X[half:] @ XT).toarray()])
+    parallel = ModelArtifact(feature_names, idf, tfidf_matrix, cosine_sim, corpus_digest(texts))
+    return same_model(build_serial(texts), parallel)
+
+
+def build_parallel(texts, workers=None, chunk_docs=None, block_rows=None, progress=print_progress):
+    """Build model dengan process pool; hasil identik dengan build_serial"""
+    texts = list(texts)
+    n = len(texts)
+    if not check_parity(texts[:PARITY_SAMPLE_DOCS]):
+        import sklearn
+        print(f"⚠️ Jalur paralel berbeda dengan serial pada sklearn {sklearn.__version__}, "
+              f"memakai jalur serial", flush=True)
+        return build_serial(texts, progress)
+    workers = plan_workers(n, workers, chunk_docs, min_docs=0)
+    chunk_docs = chunk_docs or max(1, math.ceil(n / (workers * 4)))
+    block_rows = block_rows or max(1, BLOCK_BYTES // (8 * max(n, 1)))
+    ctx = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+        # 1. Tokenisasi paralel (hasil dikumpulkan sesuai urutan chunk)
+        chunk_texts = [texts[i:i + chunk_docs] for i in range(0, n, chunk_docs)]
+        chunks = []
+        for chunk in pool.map(_count_chunk, chunk_texts):
+            chunks.append(chunk)
+            progress("tokenisasi", len(chunks), len(chunk_texts))
+
+        # 2. Gabung vocabulary + TF-IDF
+        feature_names, idf, tfidf_matrix = _fit_tfidf(chunks)
+        del chunks
+        progress("tfidf", 1, 1)
+
+        # 3. Similarity per blok
+        out = np.empty((n, n), dtype=np.float64)
+        cosine_sim = _cosine_similarity_blocked(tfidf_matrix, pool, workers, block_rows, out, progress)
+
+    return ModelArtifact(feature_names, idf, tfidf_matrix, cosine_sim, corpus_digest(texts))
+
+
+# ===============================
+# SIMPAN / MUAT ARTEFAK
+# ===============================
+def save_model(model, path=MODEL_PATH):
+    # Artefak berupa pickle: hanya ditulis di folder yang tidak bisa ditulis user lain
+    directory = ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_model(path=MODEL_PATH, catalogue=None):
+    """Muat artefak; None jika tidak ada atau tidak cocok dengan katalog"""
+    if not os.path.exists(path):
+        return None
+    # pickle.load bisa menjalankan kode: tolak file yang bisa ditanam user lain
+    if not (is_private(os.path.dirname(os.path.abspath(path))) and is_private(path)):
+        print(f"⚠️ Model {path} tidak berada di folder privat milik user ini, diabaikan")
+        return None
+    try:
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ Gagal memuat model {path}: {e}")
+        return None
+    if catalogue is not None and model.corpus_hash != corpus_digest(catalogue.texts("combined_text")):
+        return None
+    return model
+
+
+class BackgroundBuild:
+    """
+    Menyiapkan model di thread latar: pakai artefak yang masih cocok, build
+    serial langsung di thread ini untuk katalog kecil, atau jalankan CLI ini
+    di subprocess (bukan process pool di dalam proses Streamlit, karena spawn
+    mengimpor ulang __main__ milik Streamlit).
+    """
+
+    def __init__(self, catalogue, path=MODEL_PATH, workers=None, min_docs=PARALLEL_MIN_DOCS):
+        self.catalogue = catalogue
+        self.path = path
+        self.workers = plan_workers(len(catalogue), workers, min_docs=min_docs)
+        self.min_docs = min_docs
+        self.progress = None
+        self._model = None
+        self._thread = threading.Thread(target=self._run, name="model-build", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self, timeout=None):
+        """Model hasil build, atau None jika gagal"""
+        self._thread.join(timeout)
+        return self._model
+
+    def _set_progress(self, stage, done, total):
+        """(tahap, selesai, total) terakhir, dibaca halaman selama build berjalan"""
+        self.progress = (stage, done, total)
+
+    def _run(self):
+        model = load_model(self.path, self.catalogue)
+        if model is None and self.workers == 1:
+            started = time.perf_counter()
+            try:
+                model = build_serial(self.catalogue.texts("combined_text"), self._set_progress)
+                save_model(model, self.path)
+            except Exception as e:
+                print(f"⚠️ Build model gagal: {e}")
+                return
+            print(f"✅ Model selesai dibangun dalam {time.perf_counter() - started:.1f} s")
+        elif model is None:
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__),
+                 "--out", self.path, "--workers", str(self.workers),
+                 "--min-docs", str(self.min_docs)],
+                stdout=subprocess.PIPE,
+                text=True
+            )
+            for line in process.stdout:
+                match = PROGRESS_PATTERN.match(line.strip())
+                if match:
+                    stage, done, total = match.groups()
+                    self._set_progress(stage, int(done), int(total))
+            if process.wait() != 0:
+                print(f"⚠️ Build model gagal (exit {process.returncode})")
+                return
+            model = load_model(self.path, self.catalogue)
+            print(f"✅ Model selesai dibangun dalam {time.perf_counter() - started:.1f} s")
+        self._model = model
+
+
+def main():
+    from catalogue import load_catalogue
+
+    parser = argparse.ArgumentParser(description="Build model rekomendasi secara offline")
+    parser.add_argument("--out", default=MODEL_PATH, help="path artefak model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-docs", type=int, default=None, help="dokumen per chunk tokenisasi")
+    parser.add_argument("--block-rows", type=int, default=None, help="baris per blok similarity")
+    parser.add_argument("--min-docs", type=int, default=PARALLEL_MIN_DOCS,
+                        help="jumlah produk minimal untuk jalur paralel (0 = selalu paralel)")
+    parser.add_argument("--check", action="store_true",
+                        help="bandingkan hasil dengan jalur serial")
+    args = parser.parse_args()
+
+    catalogue = load_catalogue()
+    texts = list(catalogue.texts("combined_text"))
+
+    workers = plan_workers(len(texts), args.workers, args.chunk_docs, args.min_docs)
+    started = time.perf_counter()
+    if workers == 1:
+        model = build_serial(texts, print_progress)
+    else:
+        model = build_parallel(texts, workers=workers,
+                               chunk_docs=args.chunk_docs, block_rows=args.block_rows)
+    print(f"🧠 Build {len(texts)} produk, {len(model.feature_names)} fitur "
+          f"dalam {time.perf_counter() - started:.1f} s", flush=True)
+
+    if args.check:
+        same = same_model(build_serial(texts), model)
+        print("✅ Identik dengan jalur serial" if same else "❌ Berbeda dengan jalur serial")
+        if not same:
+            sys.exit(1)
+
+    save_model(model, args.out)
+    print(f"💾 Model disimpan ke {args.out}")
+
+
+if __name__ == "__main__":
+    # Lewat nama modul, agar artefak ter-pickle sebagai model_builder.ModelArtifact
+    from model_builder import main
+    main()
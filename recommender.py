@@ -1,41 +1,107 @@
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import scipy.sparse as sp
+
+from catalogue import CompactCatalogue
+from model_builder import build_serial
+
+# Hasil rekomendasi hanya bergantung pada input dan versi katalog
+RECOMMEND_TTL = 60 * 60
+
+# Jumlah term TF-IDF yang ditampilkan per produk pada mode explain
+EXPLAIN_TERMS = 5
 
 class SkincareRecommender:
-    def __init__(self, df):
-        self.df = df
-        self.tfidf = TfidfVectorizer(
-            max_features=5000,
-            ngram_range=(1, 2)
+    def __init__(self, catalogue, model=None, cache=None):
+        if isinstance(catalogue, pd.DataFrame):
+            catalogue = CompactCatalogue.from_frame(catalogue)
+        self.catalogue = catalogue
+        # Tanpa artefak siap pakai, build serial di proses ini
+        if model is None:
+            model = build_serial(catalogue.texts("combined_text"))
+        self.model = model
+        self.tfidf_matrix = model.tfidf_matrix
+        self.cosine_sim = model.cosine_sim
+        self.cache = cache
+    
+    def recommend(self, skin_types, categories, top_n=5, explain=False):
+        """
+        Memberikan rekomendasi produk. Dengan `explain=True` hasil mendapat
+        kolom `similarity` (skor rata-rata cosine terhadap produk yang lolos
+        filter) dan `top_terms` (list (term, kontribusi) terbesar).
+        """
+        if self.cache is None:
+            return self._recommend(skin_types, categories, top_n, explain)
+        key = ("recommend", tuple(sorted(skin_types or ())), tuple(sorted(categories or ())), top_n, explain)
+        recs = self.cache.get_or_compute(
+            key,
+            lambda: self._recommend(skin_types, categories, top_n, explain),
+            ttl=RECOMMEND_TTL
         )
-        self.tfidf_matrix = self.tfidf.fit_transform(df["combined_text"])
-        self.cosine_sim = cosine_similarity(self.tfidf_matrix)
+        # Objek di cache dipakai bersama semua sesi; pemanggil mendapat salinan
+        return recs.copy()
     
-    def recommend(self, skin_types, categories, top_n=5):
-        """Memberikan rekomendasi produk"""
-        filtered_idx = []
-        
-        for idx, row in self.df.iterrows():
-            if skin_types and not any(s in row["skin_type"] for s in skin_types):
-                continue
-            if categories and not any(c in row["category"] for c in categories):
+    def recommend_batch(self, queries, top_n=5, explain=False):
+        """
+        Rekomendasi untuk banyak query sekaligus (audit relevansi offline).
+        `queries` berisi pasangan (skin_types, categories). Hasil satu DataFrame
+        dengan kolom `query` (posisi di `queries`) dan `rank`; cache dilewati
+        agar audit besar tidak mengusir entri milik halaman.
+        """
+        frames = []
+        for query_id, (skin_types, categories) in enumerate(queries):
+            recs = self._recommend(skin_types, categories, top_n, explain)
+            if recs.empty:
                 continue
-            filtered_idx.append(idx)
+            recs.insert(0, "query", query_id)
+            recs.insert(1, "rank", np.arange(1, len(recs) + 1))
+            frames.append(recs)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames)
+    
+    def _recommend(self, skin_types, categories, top_n, explain=False):
+        mask = np.ones(len(self.catalogue), dtype=bool)
+        if skin_types:
+            mask &= self.catalogue.has_any("skin_type", skin_types)
+        if categories:
+            mask &= self.catalogue.has_any("category", categories)
+        filtered_idx = np.flatnonzero(mask)
         
-        if not filtered_idx:
+        if len(filtered_idx) == 0:
             return pd.DataFrame()
         
         # Hitung similarity
         sim_scores = self.cosine_sim[filtered_idx].mean(axis=0)
         
-        scores_df = pd.DataFrame({
-            "index": range(len(sim_scores)),
-            "similarity": sim_scores
-        })
-        
-        scores_df = scores_df[scores_df["index"].isin(filtered_idx)]
-        scores_df = scores_df.sort_values(by="similarity", ascending=False)
+        order = np.argsort(-sim_scores[filtered_idx], kind="stable")
+        top_indices = filtered_idx[order[:top_n]]
+        recs = self.catalogue.frame(top_indices.tolist())
+        if explain:
+            recs["similarity"] = sim_scores[top_indices]
+            recs["top_terms"] = self._explain(filtered_idx, top_indices)
+        return recs
+    
+    def _explain(self, filtered_idx, top_indices, n_terms=EXPLAIN_TERMS):
+        """
+        Kontribusi per term untuk tiap produk terpilih.
+
+        Baris TF-IDF sudah ternormalisasi L2, sehingga rata-rata cosine sama
+        dengan dot product centroid query dan baris produk. Perkalian
+        element-wise keduanya (sparse) memberi kontribusi tiap term; jumlahnya
+        sama dengan skor similarity.
+        """
+        k = len(filtered_idx)
+        weights = sp.csr_matrix(np.full((1, k), 1.0 / k))
+        centroid = weights @ self.tfidf_matrix[filtered_idx]
+        contributions = self.tfidf_matrix[top_indices].multiply(centroid).tocsr()
         
-        top_indices = scores_df.head(top_n)["index"].tolist()
-        return self.df.loc[top_indices]
\ No newline at end of file
+        feature_names = self.model.feature_names
+        explanations = []
+        for i in range(contributions.shape[0]):
+            start, end = contributions.indptr[i], contributions.indptr[i + 1]
+            values = contributions.data[start:end]
+            terms = contributions.indices[start:end]
+            top = np.argsort(-values, kind="stable")[:n_terms]
+            explanations.append([(str(feature_names[terms[j]]), float(values[j])) for j in top])
+        return explanations
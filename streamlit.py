@@ -4,9 +4,14 @@ from mysql.connector import Error
 import pandas as pd
 import os
 import tempfile
+import time
 
-from utils import load_and_merge_data, get_product_image, get_local_fallback_image
+from utils import get_product_image, get_local_fallback_image
 from recommender import SkincareRecommender
+from catalogue import CompactCatalogue, load_catalogue
+from model_builder import BackgroundBuild, build_serial
+from cache import get_default_cache
+from db import save_recommendation
 
 def load_css(file_name):
     with open(file_name) as f:
@@ -74,23 +79,63 @@ def get_db_connection():
         return None
   
 
+# ===============================
+# CACHE (LRU DALAM PROSES + TINGKAT BERSAMA)
+# ===============================
+cache = get_default_cache()
+
+# Katalog versi dataset lama ikut kedaluwarsa di backend jaringan
+CATALOGUE_TTL = 7 * 24 * 60 * 60
+
 # ===============================
 # LOAD DATA
 # ===============================
-@st.cache_data
+@st.cache_resource
 def load_data():
-    return load_and_merge_data()
+    # Katalog ringkas: label sebagai kode integer, teks di blob mmap.
+    # Dibagi antar proses/pod lewat cache bersama.
+    return cache.get_or_compute(
+        ("catalogue",),
+        load_catalogue,
+        ttl=CATALOGUE_TTL,
+        dumps=CompactCatalogue.dumps,
+        loads=CompactCatalogue.loads,
+        lease_ttl=120,
+        local=False
+    )
 
-df = load_data()
+catalogue = load_data()
 
 # ===============================
 # INITIALIZE RECOMMENDER
 # ===============================
 @st.cache_resource
-def get_recommender():
-    return SkincareRecommender(df)
+def get_model_build():
+    # Model disiapkan di latar (artefak disk atau build baru) agar halaman
+    # tidak menunggu. Tidak lewat cache bersama: cosine_sim n×n terlalu besar
+    # untuk satu nilai SQLite/HTTP, dan artefak sudah dibagi lewat model.pkl.
+    return BackgroundBuild(catalogue).start()
+
+model_build = get_model_build()
 
-recommender = get_recommender()
+def wait_for_model():
+    """Tampilkan progres build model di latar sampai selesai"""
+    if model_build.done():
+        return
+    progress_bar = st.progress(0.0, text="⏳ Menyiapkan model rekomendasi...")
+    while not model_build.done():
+        if model_build.progress:
+            stage, done, total = model_build.progress
+            progress_bar.progress(done / total, text=f"⏳ Menyiapkan model rekomendasi: {stage} {done}/{total}")
+        time.sleep(0.2)
+    progress_bar.empty()
+
+@st.cache_resource(show_spinner="⏳ Menyiapkan model rekomendasi...")
+def get_recommender():
+    model = model_build.result()
+    if model is None:
+        model = build_serial(catalogue.texts("combined_text"))
+    return SkincareRecommender(catalogue, model, cache)
 
 # ===============================
 # HEADER SECTION
@@ -153,8 +198,8 @@ with st.sidebar:
         key="gender_input")
 
     # Extract options from data
-    skin_type_options = sorted({s for sub in df["skin_type"] for s in sub})
-    category_options = sorted({c for sub in df["category"] for c in sub})
+    skin_type_options = catalogue.options("skin_type")
+    category_options = catalogue.options("category")
     
     selected_skin_type = st.multiselect(
         "**Jenis Kulit**",
@@ -180,6 +225,10 @@ with st.sidebar:
     use_local_fallback = st.checkbox("Gunakan gambar default jika tidak ada", value=True, 
                                      help="Gunakan gambar dari folder assets jika gambar produk tidak ditemukan")
     
+    # Mode explain: skor similarity dan term TF-IDF penyumbang terbesar
+    show_explain = st.checkbox("Tampilkan alasan rekomendasi", value=False,
+                               help="Tampilkan skor kecocokan dan kata kunci yang paling berpengaruh")
+    
     search_clicked = st.button(
         "🔍 **Cari Rekomendasi**", 
         type="primary", 
@@ -191,45 +240,13 @@ with st.sidebar:
 # ===============================
 def save_recommendation_to_db(user_name, user_age, gender, skin_types, categories, recommendations):
     """Simpan rekomendasi ke database"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        cursor = conn.cursor()
-        
-        # 1. Simpan user history
-        skin_types_str = ",".join(skin_types) if skin_types else ""
-        categories_str = ",".join(categories) if categories else ""
-        
-        cursor.execute("""
-        INSERT INTO user_history 
-        (username, age, gender, skin_type, category) 
-        VALUES (%s, %s, %s, %s, %s)
-        """, (user_name, user_age, gender, skin_types_str, categories_str))
-        
-        user_id = cursor.lastrowid
-        
-        # 2. Simpan rekomendasi produk
-        max_recommendations = 3
-        for i in range(min(max_recommendations, len(recommendations))):
-            product = recommendations.iloc[i]
-            cursor.execute("""
-            INSERT INTO item_recommend 
-            (user_id, product_name, rank_position, product_urls) 
-            VALUES (%s, %s, %s, %s)
-            """, (
-                user_id,
-                product['name'],
-                i + 1,
-                product.get('url')
-            ))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return user_id
-        
+        return save_recommendation(
+            get_db_connection,
+            user_name, user_age, gender,
+            skin_types, categories,
+            recommendations
+        )
     except Error as e:
         st.error(f"❌ Error saving to database: {e}")
         return None
@@ -253,7 +270,9 @@ if search_clicked:
         ''', unsafe_allow_html=True)
         
         # Get recommendations
-        recs = recommender.recommend(selected_skin_type, selected_category, top_n)
+        wait_for_model()
+        recommender = get_recommender()
+        recs = recommender.recommend(selected_skin_type, selected_category, top_n, explain=show_explain)
         if recs.empty:
             st.error("Tidak ditemukan produk yang sesuai.")
         else:
@@ -347,6 +366,17 @@ if search_clicked:
                             ingredients_text = product["ingredients"][:250] + "..." if len(product["ingredients"]) > 250 else product["ingredients"]
                             st.markdown(f'<div class="expand-content">{ingredients_text}</div>', unsafe_allow_html=True)
                         
+                        # Alasan rekomendasi (mode explain)
+                        if show_explain:
+                            with st.expander("🔎 **Alasan Rekomendasi**", expanded=False):
+                                terms_html = ", ".join(f"{term} ({weight:.3f})" for term, weight in product["top_terms"])
+                                st.markdown(f'''
+                                <div class="expand-content">
+                                    Skor kecocokan: <strong>{product["similarity"]:.3f}</strong><br>
+                                    Kata kunci: {terms_html or "-"}
+                                </div>
+                                ''', unsafe_allow_html=True)
+                        
                         # Product Link Button
                         st.markdown(f'''
                         <a href="{product['url']}" target="_blank" class="btn-product-link">
@@ -0,0 +1,208 @@
+"""
+Tes logika cache.py: single-flight di dalam proses, lease antar proses,
+tanda tangan HMAC dan pembersihan SQLite. Backend jaringan diwakili
+loadtest.KVServer yang mengikuti protokol HTTPBackend.
+
+    python -m pytest -q test_cache.py
+"""
+import threading
+import time
+
+import pytest
+
+from cache import HTTPBackend, LRUCache, SQLiteBackend, TieredCache
+from loadtest import KVServer
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+
+
+@pytest.fixture
+def http_backend():
+    server = KVServer().start()
+    yield HTTPBackend(server.base_url)
+    server.stop()
+
+
+@pytest.fixture(params=["sqlite", "http"])
+def backend(request):
+    return request.getfixturevalue(f"{request.param}_backend")
+
+
+def run_concurrently(n, target):
+    """Jalankan `target()` di n thread; hasil berupa list (value, exception)"""
+    results = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = (target(), None)
+        except Exception as e:
+            results[i] = (None, e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+class BlockingCompute:
+    """compute() yang menahan leader sampai `release()` agar follower sempat menunggu"""
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self._release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def release(self):
+        self._release.set()
+
+
+# ===============================
+# LRU
+# ===============================
+def test_lru_evicts_oldest_and_expires_entries():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") == (False, None)
+    assert lru.get("a") == (True, 1)
+
+    lru.set("short", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert lru.get("short") == (False, None)
+
+
+# ===============================
+# SINGLE-FLIGHT DI DALAM PROSES
+# ===============================
+def test_followers_get_leader_result():
+    cache = TieredCache(local_maxsize=16)
+    compute = BlockingCompute(value=object())
+
+    threads, results = run_concurrently(8, lambda: cache.get_or_compute(("k",), compute))
+    assert compute.started.wait(5)
+    time.sleep(0.05)
+    compute.release()
+    for t in threads:
+        t.join()
+
+    assert compute.calls == 1
+    assert all(value is compute.value and error is None for value, error in results)
+
+
+def test_followers_get_leader_exception_and_it_is_not_cached():
+    cache = TieredCache(local_maxsize=16)
+    compute = BlockingCompute(error=ValueError("gagal"))
+
+    threads, results = run_concurrently(8, lambda: cache.get_or_compute(("k",), compute))
+    assert compute.started.wait(5)
+    time.sleep(0.05)
+    compute.release()
+    for t in threads:
+        t.join()
+
+    assert compute.calls == 1
+    assert all(isinstance(error, ValueError) for _, error in results)
+    assert cache.get_or_compute(("k",), lambda: "ok") == "ok"
+
+
+# ===============================
+# TINGKAT 2 (SQLITE DAN HTTP)
+# ===============================
+def test_single_flight_across_processes(backend):
+    # Satu TieredCache per "proses", tanpa LRU agar semua lewat tingkat 2
+    caches = [TieredCache(backend, local_maxsize=0, poll_interval=0.01) for _ in range(4)]
+    compute = BlockingCompute(value="model")
+    lock = threading.Lock()
+    counter = iter(range(len(caches)))
+
+    def call():
+        with lock:
+            cache = caches[next(counter)]
+        return cache.get_or_compute(("k",), compute)
+
+    threads, results = run_concurrently(len(caches), call)
+    assert compute.started.wait(5)
+    time.sleep(0.1)
+    compute.release()
+    for t in threads:
+        t.join()
+
+    assert compute.calls == 1
+    assert [value for value, _ in results] == ["model"] * len(caches)
+
+
+def test_value_signed_with_other_secret_is_a_miss(backend):
+    writer = TieredCache(backend, local_maxsize=0, secret="rahasia-a")
+    assert writer.get_or_compute(("k",), lambda: "dari-a") == "dari-a"
+
+    same_secret = TieredCache(backend, local_maxsize=0, secret="rahasia-a")
+    other_secret = TieredCache(backend, local_maxsize=0, secret="rahasia-b")
+    no_secret = TieredCache(backend, local_maxsize=0)
+    assert same_secret.get_or_compute(("k",), lambda: "dihitung") == "dari-a"
+    assert other_secret.get_or_compute(("k",), lambda: "dari-b") == "dari-b"
+    assert no_secret.get_or_compute(("k",), lambda: "tanpa-secret") == "tanpa-secret"
+
+
+def test_forged_value_is_never_unpickled(backend):
+    cache = TieredCache(backend, local_maxsize=0, secret="rahasia")
+    backend.set(cache.make_key(("k",)), b"bukan pickle bertanda tangan")
+
+    def loads(data):
+        raise AssertionError("loads dipanggil untuk nilai tanpa tanda tangan valid")
+
+    assert cache.get_or_compute(("k",), lambda: "dihitung", loads=loads) == "dihitung"
+
+
+def test_unreadable_value_is_recomputed(backend):
+    cache = TieredCache(backend, local_maxsize=0)
+    backend.set(cache.make_key(("k",)), b"pickle rusak")
+
+    assert cache.get_or_compute(("k",), lambda: "baru") == "baru"
+    assert cache.get_or_compute(("k",), lambda: "tidak dipakai") == "baru"
+
+
+def test_expired_lease_can_be_taken_over(backend):
+    cache = TieredCache(backend, local_maxsize=0, poll_interval=0.01)
+    lease_key = f"lease:{cache.make_key(('k',))}"
+    # Pemegang lease "mati" tanpa pernah menulis nilai
+    assert backend.add(lease_key, b"pemilik-lama", 0.2)
+    assert not backend.add(lease_key, b"lain", 0.2)
+
+    started = time.monotonic()
+    assert cache.get_or_compute(("k",), lambda: "diambil alih", lease_ttl=10) == "diambil alih"
+    assert time.monotonic() - started < 5
+
+
+# ===============================
+# PEMBERSIHAN SQLITE
+# ===============================
+def test_sqlite_purges_expired_and_other_versions(sqlite_backend):
+    current = TieredCache(sqlite_backend, version="baru")
+    old = TieredCache(sqlite_backend, version="lama")
+    current_key, old_key = current.make_key(("k",)), old.make_key(("k",))
+    sqlite_backend.set(current_key, b"1")
+    sqlite_backend.set(old_key, b"2")
+    sqlite_backend.set(f"lease:{old_key}", b"3", 60)
+    sqlite_backend.set(current.make_key(("short",)), b"4", 0.01)
+    time.sleep(0.02)
+
+    sqlite_backend.purge_other_versions(current.key_prefix)
+    sqlite_backend.purge_expired()
+
+    keys = [key for key, in sqlite_backend._conn().execute("SELECT key FROM cache")]
+    assert keys == [current_key]
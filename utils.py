@@ -5,6 +5,23 @@ from PIL import Image
 from io import BytesIO
 import re
 import os
+import hashlib
+
+from cache import get_default_cache
+
+DATA_FILES = ("wardah_skincare_clean.csv", "wardah_product_images.csv")
+
+# Gambar produk jarang berubah; simpan bytes-nya sehari
+IMAGE_TTL = 24 * 60 * 60
+
+def data_version():
+    """Hash isi file dataset, dipakai sebagai versi key cache"""
+    digest = hashlib.sha1()
+    for path in DATA_FILES:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
 
 def normalize_product_name(name):
     """
@@ -38,8 +55,7 @@ def load_and_merge_data():
     )
     
     # Normalisasi nama di dataset utama
-    df['name_normalized'] = df['name'].apply(normalize_product_name)
-    df['name_lower'] = df['name_normalized'].apply(lambda x: x['lower'])
+    df['name_lower'] = df['name'].apply(lambda x: normalize_product_name(x)['lower'])
     
     # Load dataset gambar
     try:
@@ -56,8 +72,7 @@ def load_and_merge_data():
     
     if not df_img.empty:
         # Normalisasi nama di dataset gambar
-        df_img['name_normalized'] = df_img['name'].apply(normalize_product_name)
-        df_img['name_lower'] = df_img['name_normalized'].apply(lambda x: x['lower'])
+        df_img['name_lower'] = df_img['name'].apply(lambda x: normalize_product_name(x)['lower'])
         
         # Merge berdasarkan lowercase (karena case insensitive)
         df_merge = pd.merge(
@@ -112,19 +127,27 @@ def get_product_image(image_url, product_name):
             image_url = 'https:' + image_url
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0'
-        }
-        response = requests.get(image_url, timeout=5, headers=headers)
-        
-        if response.status_code == 200:
-            img = Image.open(BytesIO(response.content))
-            return img
+        content = get_default_cache().get_or_compute(
+            ("image", image_url),
+            lambda: fetch_image_bytes(image_url),
+            ttl=IMAGE_TTL
+        )
+        return Image.open(BytesIO(content))
     except:
         pass
     
     return None
 
+def fetch_image_bytes(image_url):
+    """Unduh isi gambar; error jika gagal agar hasilnya tidak ikut di-cache"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0'
+    }
+    response = requests.get(image_url, timeout=5, headers=headers)
+    if response.status_code != 200:
+        raise requests.HTTPError(f"HTTP {response.status_code} untuk {image_url}")
+    return response.content
+
 def get_local_fallback_image(category):
     """Mengembalikan gambar fallback lokal berdasarkan kategori"""
     # Mapping kategori ke file gambar lokal